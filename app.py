@@ -1,13 +1,43 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import database as db
 from database import init_db
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+import base64
+import csv
 import datetime
+import io
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Serializes API responses with orjson instead of the stdlib json module.
+    Dates, Decimals and other non-native types still go through Flask's default
+    hook, so the output matches DefaultJSONProvider (keys sorted, dates as HTTP dates).
+    """
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(
+            obj, default=self.default,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        ).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+# Upper bound on the page size clients may request from /api/products
+MAX_PRODUCTS_PER_PAGE = 200
+
 init_db()
 app = Flask(__name__)
+if orjson:
+    app.json = OrjsonProvider(app)
 CORS(app)
 
 @app.route('/')
@@ -51,8 +81,8 @@ def create_user():
     if not username or not password:
         return jsonify({'error': 'Username and password required'}), 400
     
-    password_hash = generate_password_hash(password)
-    success = db.add_user(username, password_hash, role)
+    # add_user hashes the password itself
+    success = db.add_user(username, password, role)
     
     if success:
         return jsonify({'message': 'User created successfully'}), 201
@@ -73,11 +103,27 @@ def delete_user(user_id):
 @app.route('/api/products', methods=['GET'])
 def get_products():
     category = request.args.get('category')
-    price_min = request.args.get('price_min')
-    price_max = request.args.get('price_max')
+    price_min = request.args.get('price_min', type=float)
+    price_max = request.args.get('price_max', type=float)
     stock_status = request.args.get('stock_status')
     search_term = request.args.get('search')
     
+    page = request.args.get('page', type=int)
+    if page is not None:
+        per_page = request.args.get('per_page', 50, type=int)
+        if page < 1 or not 1 <= per_page <= MAX_PRODUCTS_PER_PAGE:
+            return jsonify({'error': f'page must be at least 1 and per_page between 1 and {MAX_PRODUCTS_PER_PAGE}'}), 400
+        result = db.get_paginated_products(
+            page=page,
+            per_page=per_page,
+            category=category,
+            search_term=search_term,
+            stock_status=stock_status,
+            price_min=price_min,
+            price_max=price_max
+        )
+        return jsonify(result), 200
+
     products = db.get_products_with_filters(
         category=category,
         price_min=price_min,
@@ -123,6 +169,30 @@ def create_product():
     else:
         return jsonify({'error': 'Product already exists or invalid data'}), 409
 
+@app.route('/api/products/bulk', methods=['POST'])
+def create_products_bulk():
+    data = request.get_json()
+    products = data.get('products')
+
+    if not products:
+        return jsonify({'error': 'Products are required'}), 400
+
+    for product in products:
+        for field in ['name', 'price', 'stock']:
+            if field not in product:
+                return jsonify({'error': f'{field} is required'}), 400
+        if product.get('image_data'):
+            try:
+                product['image_data'] = base64.b64decode(product['image_data'])
+            except (ValueError, TypeError):
+                return jsonify({'error': 'Invalid Base64 image data'}), 400
+
+    product_ids = db.add_products_bulk(products)
+    if product_ids:
+        return jsonify({'message': 'Products created successfully', 'product_ids': product_ids}), 201
+    else:
+        return jsonify({'error': 'Product already exists or invalid data'}), 409
+
 @app.route('/api/products/<int:product_id>', methods=['GET'])
 def get_product(product_id):
     product = db.get_product_by_id(product_id)
@@ -435,6 +505,21 @@ def create_purchase():
     else:
         return jsonify({'error': 'Failed to record purchase'}), 400
 
+@app.route('/api/purchases/bulk', methods=['POST'])
+def create_purchase_bulk():
+    data = request.get_json()
+    supplier_id = data.get('supplier_id')
+    purchase_items = data.get('purchase_items')
+    
+    if not supplier_id or not purchase_items:
+        return jsonify({'error': 'Supplier ID and purchase items are required'}), 400
+    
+    success, purchase_id = db.record_purchase_bulk(supplier_id, purchase_items)
+    if success:
+        return jsonify({'message': 'Purchase recorded successfully', 'purchase_id': purchase_id}), 201
+    else:
+        return jsonify({'error': 'Failed to record purchase'}), 400
+
 @app.route('/api/purchases/<int:purchase_id>', methods=['GET'])
 def get_purchase_details(purchase_id):
     details = db.get_purchase_details(purchase_id)
@@ -466,7 +551,8 @@ def get_product_performance():
 
 @app.route('/api/reports/inventory-summary', methods=['GET'])
 def get_inventory_summary():
-    report = db.get_inventory_summary_report()
+    include_details = request.args.get('include_details', 'true').lower() != 'false'
+    report = db.get_inventory_summary_report(include_details=include_details)
     return jsonify(report), 200
 
 @app.route('/api/reports/sales-by-category', methods=['GET'])
@@ -505,9 +591,32 @@ def get_accounts_by_type(account_type):
 
 @app.route('/api/journal-entries', methods=['GET'])
 def get_journal_entries():
-    entries = db.get_journal_entries()
+    limit = request.args.get('limit', type=int)
+    offset = request.args.get('offset', 0, type=int)
+    if (limit is not None and limit < 1) or offset < 0:
+        return jsonify({'error': 'limit must be at least 1 and offset must not be negative'}), 400
+    entries = db.get_journal_entries(limit=limit, offset=offset)
     return jsonify(entries), 200
 
+@app.route('/api/journal-entries/export', methods=['GET'])
+def export_journal_entries():
+    # Rows are streamed from the database to the client as CSV, so the full
+    # journal is never held in memory.
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=['date', 'account_name', 'description', 'debit', 'credit'])
+        writer.writeheader()
+        for entry in db.iter_journal_entries():
+            writer.writerow(entry)
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        yield buffer.getvalue()
+
+    return Response(generate(), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=journal_entries.csv'})
+
 @app.route('/api/expenses', methods=['POST'])
 def create_expense():
     data = request.get_json()
@@ -534,18 +643,15 @@ def create_expense():
 # =========================
 @app.route('/api/dashboard', methods=['GET'])
 def get_dashboard_data():
-    total_sales = db.get_total_sales_amount()
-    total_products = db.get_total_products_count()
-    total_categories = db.get_total_categories_count()
-    low_stock_count = db.get_low_stock_count()
+    totals = db.get_dashboard_totals()
     weekly_sales = db.get_weekly_sales_summary()
     top_products = db.get_top_selling_products(limit=5)
     
     return jsonify({
-        'total_sales': total_sales,
-        'total_products': total_products,
-        'total_categories': total_categories,
-        'low_stock_count': low_stock_count,
+        'total_sales': totals['total_sales'],
+        'total_products': totals['total_products'],
+        'total_categories': totals['total_categories'],
+        'low_stock_count': totals['low_stock_count'],
         'weekly_sales': weekly_sales,
         'top_products': top_products
     }), 200
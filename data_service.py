@@ -27,6 +27,11 @@ class DataService:
         """Add new product"""
         return db.add_product(**kwargs)
     
+    @staticmethod
+    def add_products_bulk(products_list: List[Dict[str, Any]]) -> Optional[List[int]]:
+        """Add many products in one transaction"""
+        return db.add_products_bulk(products_list)
+    
     @staticmethod
     def update_product(**kwargs) -> bool:
         """Update existing product"""
@@ -105,12 +110,7 @@ class DataService:
     @staticmethod
     def get_dashboard_stats() -> Dict[str, Any]:
         """Get dashboard statistics"""
-        return {
-            'total_sales': db.get_total_sales_amount(),
-            'total_products': db.get_total_products_count(),
-            'total_categories': db.get_total_categories_count(),
-            'low_stock_count': db.get_low_stock_count()
-        }
+        return db.get_dashboard_totals()
     
     @staticmethod
     def get_weekly_sales() -> List[Dict[str, Any]]:
@@ -1,32 +1,326 @@
+import atexit
+import copy
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import pool
+from psycopg2.extras import RealDictCursor, execute_values
 import os
 import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
 import random
 from werkzeug.security import generate_password_hash, check_password_hash
 from psycopg2.extras import RealDictCursor
 
+CENT = Decimal('0.01')
+# scrypt verifies in about half the time of werkzeug 2.x's pbkdf2:sha256:600000 default
+# and is memory-hard. Existing pbkdf2 hashes keep verifying, since the method is
+# stored in each hash.
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+
+def _to_money(value):
+    """Converts a numeric value to a Decimal rounded to whole cents."""
+    return Decimal(str(value or 0)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+# --- Frequently executed statements ---
+SQL_GET_PRODUCT = """
+    SELECT p.id, p.name, p.price, p.stock, p.category_id, p.sku, p.description,
+           p.barcode, p.buying_price, p.low_stock_threshold, c.name as category_name
+    FROM products p
+    LEFT JOIN categories c ON p.category_id = c.id
+    WHERE p.id = %s
+"""
+# The ID list is bound as one array parameter, so any number of IDs uses the same statement
+SQL_GET_PRODUCTS_BY_IDS = """
+    SELECT p.id, p.name, p.price, p.stock, p.category_id, p.sku, p.description,
+           p.barcode, p.buying_price, p.low_stock_threshold, c.name as category_name
+    FROM products p
+    LEFT JOIN categories c ON p.category_id = c.id
+    WHERE p.id = ANY(%s)
+"""
+SQL_GET_SUPPLIER = "SELECT id, name, contact_person, phone FROM suppliers WHERE id = %s"
+SQL_GET_USER = "SELECT id, username, password_hash, role FROM users WHERE username = %s"
+SQL_GET_SALE = """
+    SELECT s.id, s.sale_date, s.total_amount, s.discount_amount, s.tax_amount,
+           s.customer_id, s.status, s.due_date,
+           COALESCE(c.name, 'N/A') as customer_name
+    FROM sales s
+    LEFT JOIN customers c ON s.customer_id = c.id
+    WHERE s.id = %s
+"""
+SQL_GET_SALES_BY_IDS = """
+    SELECT s.id, s.sale_date, s.total_amount, s.discount_amount, s.tax_amount,
+           s.customer_id, s.status, s.due_date,
+           COALESCE(c.name, 'N/A') as customer_name
+    FROM sales s
+    LEFT JOIN customers c ON s.customer_id = c.id
+    WHERE s.id = ANY(%s)
+"""
+SQL_GET_SALE_ITEMS = """
+    SELECT si.id, si.product_id, p.name as product_name, si.quantity, si.price_at_sale,
+           si.quantity * si.price_at_sale as subtotal
+    FROM sale_items si
+    JOIN products p ON si.product_id = p.id
+    WHERE si.sale_id = %s
+    ORDER BY si.id
+"""
+# Report statements take an optional date range through _sale_date_bounds(), so one
+# prepared statement serves every range
+SQL_SALES_SUMMARY = """
+    WITH filtered_sales AS (
+        SELECT s.id, s.total_amount, s.discount_amount, s.tax_amount,
+               round((s.total_amount + s.discount_amount)::double precision::numeric, 2) as gross_amount
+        FROM sales s
+        WHERE s.sale_date BETWEEN COALESCE(%s::timestamp, '-infinity') AND COALESCE(%s::timestamp, 'infinity')
+    ),
+    sale_totals AS (
+        SELECT COALESCE(SUM(total_amount), 0) as total_sales,
+               COUNT(id) as total_transactions,
+               COALESCE(SUM(discount_amount), 0) as total_discounts,
+               -- sales.tax_amount holds the tax RATE; like record_sale, the tax is
+               -- back-calculated from the pre-discount subtotal (total + discount)
+               -- with the net amount rounded to cents, so it matches Sales Tax Payable
+               COALESCE(SUM(gross_amount - round(gross_amount / (1 + tax_amount::double precision::numeric), 2)), 0)::float8 as total_tax,
+               COALESCE(AVG(tax_amount), 0) as average_tax_rate
+        FROM filtered_sales
+    ),
+    item_totals AS (
+        SELECT COALESCE(SUM(si.quantity * si.price_at_sale), 0) as gross_sales,
+               COALESCE(SUM(si.quantity * p.buying_price), 0) as cost_of_goods_sold
+        FROM filtered_sales f
+        JOIN sale_items si ON si.sale_id = f.id
+        JOIN products p ON si.product_id = p.id
+    )
+    SELECT * FROM sale_totals, item_totals
+"""
+# Grouped and cut to the top `limit` products before joining products, so only the
+# returned rows pay for the wider product columns. {order_column} is filled from a whitelist.
+SQL_PRODUCT_PERFORMANCE = """
+    WITH top_products AS (
+        SELECT si.product_id,
+               SUM(si.quantity) as total_quantity,
+               SUM(si.quantity * si.price_at_sale) as total_revenue
+        FROM sale_items si
+        JOIN sales s ON si.sale_id = s.id
+        WHERE s.sale_date BETWEEN COALESCE(%s::timestamp, '-infinity') AND COALESCE(%s::timestamp, 'infinity')
+        GROUP BY si.product_id
+        ORDER BY {order_column} DESC
+        LIMIT %s
+    )
+    SELECT p.id as product_id, p.name, p.sku, t.total_quantity, t.total_revenue
+    FROM top_products t
+    JOIN products p ON p.id = t.product_id
+    ORDER BY t.{order_column} DESC, p.name
+"""
+SQL_ADD_CUSTOMER = "INSERT INTO customers (name, phone, email) VALUES (%s, %s, %s) RETURNING id"
+SQL_ADD_CATEGORY = "INSERT INTO categories (name) VALUES (%s) RETURNING id"
+# Walks idx_product_sales_rollup_qty, so only `limit` rollup rows are read
+SQL_TOP_SELLING_PRODUCTS = """
+    SELECT p.name, r.qty_sold as total_sold
+    FROM product_sales_rollup r
+    JOIN products p ON p.id = r.product_id
+    WHERE r.qty_sold > 0
+    ORDER BY r.qty_sold DESC
+    LIMIT %s
+"""
+
+# Columns returned by the product listings. image_data is left out: it can be
+# large, cannot be serialized to JSON, and is served by get_product_image_data().
+PRODUCT_LIST_COLUMNS = """
+    p.id, p.name, p.price, p.stock, p.category_id, p.sku, p.description,
+    p.barcode, p.buying_price, p.low_stock_threshold, c.name as category_name
+"""
+
+_db_pool = None
+_db_read_pool = None
+_db_pool_lock = threading.Lock()
+# Connections borrowed from the read pool, so release_db() can hand them back there
+_read_connections = weakref.WeakSet()
+
+def _create_pool(dsn, minconn, maxconn, options):
+    # Connections are opened once and reused across requests instead of
+    # paying the connect/auth handshake on every database call.
+    # Up to minconn idle connections are kept open; extra ones
+    # (up to maxconn) are closed when handed back, losing their prepared
+    # statements, so minconn defaults to maxconn.
+    return pool.ThreadedConnectionPool(
+        minconn,
+        maxconn,
+        dsn,
+        options=options,
+        # Every cursor returns rows as plain dicts (e.g., row['name']), so results
+        # can be handed to jsonify as-is without a per-call cursor_factory.
+        cursor_factory=RealDictCursor
+    )
+
+def _session_options():
+    # Session settings are sent once in the startup packet of each pooled
+    # connection: more sort/hash memory for the report queries and no JIT
+    # compilation, which costs more than it saves on short OLTP statements.
+    # Set DB_SESSION_OPTIONS to '' when connecting through a pooler that
+    # rejects startup options.
+    return os.environ.get('DB_SESSION_OPTIONS', '-c work_mem=16MB -c jit=off')
+
+def _pool_max_conn(env_name, floor):
+    # ThreadedConnectionPool raises PoolError instead of waiting when it is full,
+    # so unless overridden a pool gets at least one connection per gunicorn
+    # thread (GUNICORN_THREADS, same default as gunicorn_config.py).
+    if env_name in os.environ:
+        return int(os.environ[env_name])
+    return max(floor, int(os.environ.get('GUNICORN_THREADS', 4)))
+
+def _get_db_pool():
+    """Lazily creates the process-wide connection pool."""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                maxconn = _pool_max_conn('DB_POOL_MAX_CONN', 5)
+                _db_pool = _create_pool(
+                    os.environ.get('DATABASE_URL'),
+                    int(os.environ.get('DB_POOL_MIN_CONN', maxconn)),
+                    maxconn,
+                    _session_options()
+                )
+    return _db_pool
+
+def _get_db_read_pool():
+    """
+    Lazily creates the pool used by the report queries. It points at DATABASE_READ_URL
+    (e.g. a read replica) when set, and at DATABASE_URL otherwise; either way reports
+    draw from their own connections, so a burst of dashboard refreshes cannot use up
+    the connections that sales and purchases need.
+    """
+    global _db_read_pool
+    if _db_read_pool is None:
+        with _db_pool_lock:
+            if _db_read_pool is None:
+                maxconn = _pool_max_conn('DB_READ_POOL_MAX_CONN', 3)
+                _db_read_pool = _create_pool(
+                    os.environ.get('DATABASE_READ_URL') or os.environ.get('DATABASE_URL'),
+                    int(os.environ.get('DB_READ_POOL_MIN_CONN', maxconn)),
+                    maxconn,
+                    f"{_session_options()} -c default_transaction_read_only=on".strip()
+                )
+    return _db_read_pool
+
 def connect_db():
     """
-    Connects to the PostgreSQL database using the DATABASE_URL environment variable.
+    Borrows a connection to the PostgreSQL database (DATABASE_URL) from the pool.
+    Every connection must be handed back with release_db().
     """
     try:
-        # Connect using the single URL from the environment.
-        # This is more secure and standard for cloud apps.
-        conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
-        
-        # This makes the cursor return dictionary-like rows (e.g., row['name'])
-        # which is needed for the rest of your code to work as intended.
-        conn.cursor_factory = psycopg2.extras.DictCursor
-        
-        return conn
+        return _get_db_pool().getconn()
         
     except (Exception, psycopg2.DatabaseError) as error:
         # This prevents your app from crashing if the database is unavailable.
         print(f"Error connecting to PostgreSQL database: {error}")
         return None
 
+def connect_db_readonly():
+    """
+    Borrows a read-only connection for report queries from the read pool.
+    Must also be handed back with release_db().
+    """
+    try:
+        conn = _get_db_read_pool().getconn()
+        _read_connections.add(conn)
+        return conn
+
+    except (Exception, psycopg2.DatabaseError) as error:
+        print(f"Error connecting to PostgreSQL database: {error}")
+        return None
+
+def release_db(conn):
+    """Returns a connection to the pool it came from, discarding any uncommitted work."""
+    if not conn: return
+    broken = bool(conn.closed)
+    if not broken:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            broken = True
+    if conn in _read_connections:
+        _read_connections.discard(conn)
+        _get_db_read_pool().putconn(conn, close=broken)
+    else:
+        _get_db_pool().putconn(conn, close=broken)
+
+def open_db_pool():
+    """
+    Creates both pools up front so their minimum connections are already open
+    when the first request arrives. Called from gunicorn's post_fork hook.
+    """
+    _get_db_pool()
+    _get_db_read_pool()
+
+def close_db_pool():
+    """Closes every pooled connection. Registered to run at interpreter exit."""
+    global _db_pool, _db_read_pool
+    with _db_pool_lock:
+        if _db_pool is not None:
+            _db_pool.closeall()
+            _db_pool = None
+        if _db_read_pool is not None:
+            _db_read_pool.closeall()
+            _db_read_pool = None
+
+atexit.register(close_db_pool)
+
+@contextmanager
+def transaction():
+    """
+    Borrows a pooled connection for a unit of work. Commits once when the block
+    completes and rolls back if anything inside it raises.
+    """
+    conn = connect_db()
+    if not conn:
+        raise psycopg2.OperationalError("Database connection is unavailable.")
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db(conn)
+
+# Names of the statements already PREPAREd on each pooled connection
+_prepared_statements = weakref.WeakKeyDictionary()
+
+def _execute_prepared(cursor, name, sql, params):
+    """
+    Runs one of the hot lookup statements through a server-side prepared statement,
+    so PostgreSQL parses and plans it once per pooled connection instead of per call.
+    Prepared statements outlive transactions, so release_db()'s rollback keeps them.
+    Set DB_PREPARE_STATEMENTS=0 behind a transaction-mode pooler such as PgBouncer.
+    """
+    if os.environ.get('DB_PREPARE_STATEMENTS', '1') == '0':
+        cursor.execute(sql, params)
+        return
+
+    prepared = _prepared_statements.setdefault(cursor.connection, set())
+    if name not in prepared:
+        # PREPARE takes numbered $n parameters rather than psycopg2's %s placeholders
+        parts = sql.split('%s')
+        numbered_sql = parts[0] + ''.join(f"${i}{part}" for i, part in enumerate(parts[1:], start=1))
+        cursor.execute(f"PREPARE {name} AS {numbered_sql}")
+        prepared.add(name)
+    cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+
+def _fetchall_as_dicts(cursor):
+    """
+    Fetches all rows from a plain tuple cursor as a list of dicts. Used for the
+    large listings: the column names are read once per query, and a plain dict per
+    row is far cheaper to build than RealDictCursor's per-row RealDictRow.
+    """
+    columns = [column.name for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
 def populate_chart_of_accounts():
     """Populates the CoA with standard accounts for a retail business."""
     conn = connect_db()
@@ -62,12 +356,49 @@ def populate_chart_of_accounts():
             accounts
         )
         conn.commit()
+        _accounts_by_type_cache.clear()
         print("Default Chart of Accounts populated.")
     except psycopg2.Error as e:
         print(f"Error populating Chart of Accounts: {e}")
         conn.rollback()
     finally:
-        conn.close()
+        release_db(conn)
+
+def _create_product_sales_rollup_trigger(cursor):
+    """Installs the trigger that keeps product_sales_rollup in step with sale_items."""
+    cursor.execute('''
+        CREATE OR REPLACE FUNCTION apply_sale_item_to_rollup() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE product_sales_rollup SET qty_sold = qty_sold - OLD.quantity
+                WHERE product_id = OLD.product_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO product_sales_rollup (product_id, qty_sold)
+                VALUES (NEW.product_id, NEW.quantity)
+                ON CONFLICT (product_id) DO UPDATE
+                SET qty_sold = product_sales_rollup.qty_sold + EXCLUDED.qty_sold;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+
+    cursor.execute("SELECT 1 FROM pg_trigger WHERE tgname = 'trg_sale_items_rollup'")
+    if cursor.fetchone():
+        return
+
+    cursor.execute('''
+        CREATE TRIGGER trg_sale_items_rollup
+        AFTER INSERT OR UPDATE OR DELETE ON sale_items
+        FOR EACH ROW EXECUTE FUNCTION apply_sale_item_to_rollup()
+    ''')
+    # Backfill from the items sold before the trigger existed
+    cursor.execute("DELETE FROM product_sales_rollup")
+    cursor.execute('''
+        INSERT INTO product_sales_rollup (product_id, qty_sold)
+        SELECT product_id, SUM(quantity) FROM sale_items GROUP BY product_id
+    ''')
 
 def init_db():
     """Initializes the database with all necessary tables if they don't exist."""
@@ -110,6 +441,9 @@ def init_db():
                     FOREIGN KEY (category_id) REFERENCES categories(id)
                 )
             ''')
+            # Stock value at cost and at retail, computed once per write instead of on every report
+            cursor.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS cost_value REAL GENERATED ALWAYS AS (stock * buying_price) STORED")
+            cursor.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS retail_value REAL GENERATED ALWAYS AS (stock * price) STORED")
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS sales (
                     id SERIAL PRIMARY KEY,
@@ -182,6 +516,16 @@ def init_db():
                 )
             ''')
 
+            # Units sold per product, kept current by a trigger on sale_items
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS product_sales_rollup (
+                    product_id INTEGER PRIMARY KEY,
+                    qty_sold INTEGER NOT NULL DEFAULT 0,
+                    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+                )
+            ''')
+            _create_product_sales_rollup_trigger(cursor)
+
             # --- Accounting Tables ---
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS chart_of_accounts (
@@ -219,6 +563,32 @@ def init_db():
                 )
             ''')
 
+            # Earlier versions kept running per-account totals in account_balances,
+            # updated by a trigger on every journal entry. The upserts held row locks
+            # on shared accounts (Cash, Accounts Receivable) until commit, serializing
+            # checkouts and deadlocking writers that touched them in opposite order;
+            # balances are aggregated from journal_entries instead.
+            cursor.execute("DROP TRIGGER IF EXISTS trg_journal_account_balances ON journal_entries")
+            cursor.execute("DROP FUNCTION IF EXISTS apply_journal_to_account_balances()")
+            cursor.execute("DROP TABLE IF EXISTS account_balances")
+
+            # --- Indexes ---
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_customer_status ON sales (customer_id, status)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_sale_payments_sale ON sale_payments (sale_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON products (category_id)")
+            # Partial index holding only the rows the low-stock queries look for
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_low_stock ON products (stock) WHERE stock <= low_stock_threshold")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_date ON sales (sale_date)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_product ON sale_items (product_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_sale ON sale_items (sale_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_product_sales_rollup_qty ON product_sales_rollup (qty_sold DESC)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_journal_date ON journal_entries (date, id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_journal_reference ON journal_entries (reference_type, reference_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (expense_date)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_purchase_items_purchase ON purchase_items (purchase_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_journal_debit_date ON journal_entries (debit_account_id, date)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_journal_credit_date ON journal_entries (credit_account_id, date)")
+
             conn.commit()
             print("Database initialized successfully.")
 
@@ -232,7 +602,7 @@ def init_db():
             print(f"Error initializing database: {e}")
             conn.rollback()
         finally:
-            conn.close()
+            release_db(conn)
 
 def get_product_image_data(product_id):
     """Fetches only the BLOB image data for a product."""
@@ -247,7 +617,7 @@ def get_product_image_data(product_id):
             print(f"Error fetching product image data: {e}")
             return None
         finally:
-            conn.close()
+            release_db(conn)
 
 def _create_journal_entry(cursor, description, debit_account_name, credit_account_name, amount, ref_id=None, ref_type=None):
     """Internal helper to create a journal entry. Assumes cursor is passed."""
@@ -273,42 +643,130 @@ def _create_journal_entry(cursor, description, debit_account_name, credit_accoun
         raise Exception(f"Failed to create journal entry: {e}")
 
 
+def _is_barcode_search(search_term):
+    """True for search terms that look like a scanned barcode (8 or more digits)."""
+    return bool(search_term) and search_term.strip().isdigit() and len(search_term.strip()) >= 8
+
+def _build_product_where(category=None, stock_status=None, search_term=None, price_min=None, price_max=None, exact_barcode=True):
+    """
+    Builds the WHERE clause and parameters shared by the product listing queries.
+    With exact_barcode=False a barcode-like search term is matched against name and
+    SKU like any other term; callers retry that way when the exact match finds nothing.
+    """
+    where_clause = "WHERE 1=1"
+    params = []
+
+    if category and category != "All":
+        where_clause += " AND c.name = %s"
+        params.append(category)
+
+    if price_min is not None:
+        where_clause += " AND p.price >= %s"
+        params.append(price_min)
+    if price_max is not None:
+        where_clause += " AND p.price <= %s"
+        params.append(price_max)
+
+    if stock_status == 'In Stock':
+        where_clause += " AND p.stock > p.low_stock_threshold"
+    elif stock_status == 'Low Stock':
+        where_clause += " AND p.stock > 0 AND p.stock <= p.low_stock_threshold"
+    elif stock_status == 'Out of Stock':
+        where_clause += " AND p.stock <= 0"
+
+    if search_term:
+        search_term = search_term.strip()
+        if exact_barcode and _is_barcode_search(search_term):
+            # A scanned barcode: exact match on the unique barcode index instead of a pattern scan
+            where_clause += " AND p.barcode = %s"
+            params.append(search_term)
+        else:
+            where_clause += " AND (p.name ILIKE %s OR p.sku ILIKE %s)"
+            params.append(f"%{search_term}%")
+            params.append(f"%{search_term}%")
+
+    return where_clause, params
 
 def get_products_with_filters(category=None, price_min=None, price_max=None, stock_status=None, search_term=None):
     """Get products with advanced filtering capabilities."""
     conn = connect_db()
     if not conn: return []
     try:
-        cursor = conn.cursor()
+        cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
         
-        # Start with a base query
-        query = """
-            SELECT p.*, c.name as category_name
-            FROM products p
-            LEFT JOIN categories c ON p.category_id = c.id
-            WHERE 1=1
-        """
-        params = []
+        # A barcode-like term is tried as an exact barcode first, then as a name/SKU pattern
+        for exact_barcode in (True, False):
+            where_clause, params = _build_product_where(category, stock_status, search_term, price_min, price_max, exact_barcode)
+            cursor.execute(f"""
+                SELECT {PRODUCT_LIST_COLUMNS}
+                FROM products p
+                LEFT JOIN categories c ON p.category_id = c.id
+                {where_clause}
+                ORDER BY p.name
+            """, tuple(params))
+            products = _fetchall_as_dicts(cursor)
+            if products or not _is_barcode_search(search_term):
+                return products
+        return products
+    except psycopg2.Error as e:
+        print(f"Error fetching products with filters: {e}")
+        return []
+    finally:
+        if conn: release_db(conn)
 
-        if category and category != "All":
-            query += " AND c.name = %s"
-            params.append(category)
-        
-        # Add other filters as needed...
+def get_paginated_products(page=1, per_page=50, category=None, search_term=None, stock_status=None, price_min=None, price_max=None):
+    """Fetches one page of products together with the total number of matching products."""
+    result = {'products': [], 'total_products': 0, 'total_pages': 0, 'current_page': page}
+    conn = connect_db()
+    if not conn: return result
+    try:
+        cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
 
-        if search_term:
-            query += " AND (p.name ILIKE %s OR p.sku ILIKE %s)"
-            params.append(f"%{search_term}%")
-            params.append(f"%{search_term}%")
+        # A barcode-like term is tried as an exact barcode first, then as a name/SKU pattern
+        for exact_barcode in (True, False):
+            where_clause, params = _build_product_where(category, stock_status, search_term, price_min, price_max, exact_barcode)
 
-        query += " ORDER BY p.name"
-        cursor.execute(query, tuple(params))
-        return cursor.fetchall()
+            # COUNT(*) OVER () reports the size of the whole filtered set on every row,
+            # so the page and the total come back from a single scan.
+            cursor.execute(f"""
+                SELECT {PRODUCT_LIST_COLUMNS},
+                       COUNT(*) OVER () as total_products
+                FROM products p
+                LEFT JOIN categories c ON p.category_id = c.id
+                {where_clause}
+                ORDER BY p.name
+                LIMIT %s OFFSET %s
+            """, params + [per_page, (page - 1) * per_page])
+            products = _fetchall_as_dicts(cursor)
+
+            if products:
+                total_products = products[0]['total_products']
+                for product in products:
+                    del product['total_products']
+            elif page > 1:
+                # Past the last page there are no rows to carry the window count
+                cursor.execute(f"""
+                    SELECT COUNT(*)
+                    FROM products p
+                    LEFT JOIN categories c ON p.category_id = c.id
+                    {where_clause}
+                """, params)
+                total_products = cursor.fetchone()[0]
+            else:
+                total_products = 0
+
+            if total_products or not _is_barcode_search(search_term):
+                break
+
+        result['products'] = products
+        result['total_products'] = total_products
+        result['total_pages'] = (total_products + per_page - 1) // per_page
+        return result
     except psycopg2.Error as e:
-        print(f"Error fetching products with filters: {e}")
-        return []
+        print(f"Error fetching paginated products: {e}")
+        return result
     finally:
-        if conn: conn.close()
+        release_db(conn)
 
 def record_sale(cart_items, payments, discount_amount=0.0, tax_rate=0.0, customer_id=None, due_date=None):
     """
@@ -321,17 +779,20 @@ def record_sale(cart_items, payments, discount_amount=0.0, tax_rate=0.0, custome
 
         if not cart_items:
              raise Exception("Cart cannot be empty.")
-        total_paid = sum(p['amount'] for p in payments) if payments else 0
+        # Money is handled as Decimal cents so totals compare exactly.
+        total_paid = sum(_to_money(p['amount']) for p in payments) if payments else Decimal(0)
+        discount_amount = _to_money(discount_amount)
+        tax_rate = Decimal(str(tax_rate or 0))
 
         # In tax-inclusive pricing, the subtotal is the gross amount before discounts.
-        subtotal = sum(item['quantity'] * item['price_at_sale'] for item in cart_items)
+        subtotal = sum(Decimal(str(item['quantity'])) * _to_money(item['price_at_sale']) for item in cart_items)
         # The final amount the customer owes is the subtotal minus the discount.
         final_total = subtotal - discount_amount
         
         # Determine sale status
         status = 'Paid'
         if customer_id:
-            if abs(total_paid - final_total) > 0.01:
+            if total_paid != final_total:
                 status = 'Partial' if total_paid > 0 else 'Due'
             else:
                 status = 'Paid'
@@ -351,24 +812,23 @@ def record_sale(cart_items, payments, discount_amount=0.0, tax_rate=0.0, custome
         for item in cart_items:
             cursor.execute("INSERT INTO sale_items (sale_id, product_id, quantity, price_at_sale) VALUES (%s, %s, %s, %s)",
                            (sale_id, item['product_id'], item['quantity'], item['price_at_sale']))
-            cursor.execute("UPDATE products SET stock = stock - %s WHERE id = %s", (item['quantity'], item['product_id']))
-
-            cursor.execute("SELECT buying_price FROM products WHERE id = %s", (item['product_id'],))
-            buying_price = cursor.fetchone()['buying_price'] or 0
-            total_cogs += item['quantity'] * buying_price
+            cursor.execute("UPDATE products SET stock = stock - %s WHERE id = %s RETURNING buying_price",
+                           (item['quantity'], item['product_id']))
+            buying_price = _to_money(cursor.fetchone()['buying_price'])
+            total_cogs += Decimal(str(item['quantity'])) * buying_price
 
         # Record each payment method
         if payments:
             for payment in payments:
                 cursor.execute("INSERT INTO sale_payments (sale_id, payment_method, amount) VALUES (%s, %s, %s)",
-                               (sale_id, payment['method'], payment['amount']))
+                               (sale_id, payment['method'], _to_money(payment['amount'])))
 
         # --- Create Corrected Double-Entry Journal Entries for Tax-Inclusive Pricing ---
         
         # 1. Back-calculate gross revenue and tax from the pre-discount subtotal.
         # The total value of the sale (before discount) is credited to revenue and tax accounts,
         # and the full amount is debited to Accounts Receivable.
-        gross_revenue = subtotal / (1 + tax_rate) if tax_rate > 0 else subtotal
+        gross_revenue = (subtotal / (1 + tax_rate)).quantize(CENT, rounding=ROUND_HALF_UP) if tax_rate > 0 else subtotal
         gross_tax = subtotal - gross_revenue
 
         _create_journal_entry(cursor, f"Gross Sale ID: {sale_id}", "Accounts Receivable", "Sales Revenue", gross_revenue, sale_id, 'sale')
@@ -387,20 +847,21 @@ def record_sale(cart_items, payments, discount_amount=0.0, tax_rate=0.0, custome
                      payment_account_name = 'Bank'
                 
                 if payment_account_name:
-                    _create_journal_entry(cursor, f"Payment for Sale ID: {sale_id} ({payment['method']})", payment_account_name, "Accounts Receivable", payment['amount'], sale_id, 'sale')
+                    _create_journal_entry(cursor, f"Payment for Sale ID: {sale_id} ({payment['method']})", payment_account_name, "Accounts Receivable", _to_money(payment['amount']), sale_id, 'sale')
 
         # 4. Record Cost of Goods Sold, which is an expense and reduces inventory asset.
         if total_cogs > 0:
             _create_journal_entry(cursor, f"COGS for Sale ID: {sale_id}", "Cost of Goods Sold", "Inventory", total_cogs, sale_id, 'sale')
 
         conn.commit()
+        _invalidate_report_cache()
         return True, sale_id
     except Exception as e:
         print(f"Error recording sale with journal entry: {e}")
         if conn: conn.rollback()
         return False, None
     finally:
-        if conn: conn.close()
+        if conn: release_db(conn)
 
 def add_payment_to_sale(sale_id, payment_method, amount):
     """Adds a new payment to an existing sale and updates the sale's status."""
@@ -408,19 +869,26 @@ def add_payment_to_sale(sale_id, payment_method, amount):
     if not conn: return False
     try:
         cursor = conn.cursor()
-        
+        # Rounded to cents like record_sale's payments, so the payment row, the
+        # journal entry and the status check all see the same amount.
+        amount = _to_money(amount)
+
         cursor.execute("INSERT INTO sale_payments (sale_id, payment_method, amount) VALUES (%s, %s, %s)",
                        (sale_id, payment_method, amount))
 
         # Update the sale's status
-        cursor.execute("SELECT total_amount FROM sales WHERE id = %s", (sale_id,))
-        total_amount = cursor.fetchone()['total_amount']
-        
-        cursor.execute("SELECT SUM(amount) FROM sale_payments WHERE sale_id = %s", (sale_id,))
-        total_paid = cursor.fetchone()['sum'] or 0.0
+        cursor.execute("""
+            SELECT s.total_amount,
+                   (SELECT SUM(amount) FROM sale_payments WHERE sale_id = s.id) as total_paid
+            FROM sales s
+            WHERE s.id = %s
+        """, (sale_id,))
+        sale_row = cursor.fetchone()
+        total_amount = _to_money(sale_row['total_amount'])
+        total_paid = _to_money(sale_row['total_paid'])
 
         new_status = 'Partial'
-        if abs(total_paid - total_amount) < 0.01:
+        if total_paid == total_amount:
             new_status = 'Paid'
         
         cursor.execute("UPDATE sales SET status = %s WHERE id = %s", (new_status, sale_id))
@@ -436,7 +904,7 @@ def add_payment_to_sale(sale_id, payment_method, amount):
         if conn: conn.rollback()
         return False
     finally:
-        if conn: conn.close()
+        if conn: release_db(conn)
 
 def get_sales_details_for_history(start_date, end_date):
     """
@@ -445,7 +913,7 @@ def get_sales_details_for_history(start_date, end_date):
     conn = connect_db()
     if not conn: return []
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
         query = """
             SELECT
                 s.id,
@@ -461,39 +929,137 @@ def get_sales_details_for_history(start_date, end_date):
             ORDER BY s.sale_date DESC
         """
         cursor.execute(query, (start_date, f"{end_date} 23:59:59"))
-        return cursor.fetchall()
+        return _fetchall_as_dicts(cursor)
     except psycopg2.Error as e:
         print(f"Error fetching detailed sales history: {e}")
         return []
     finally:
-        if conn: conn.close()
+        if conn: release_db(conn)
+
+def _sale_date_conditions(start_date=None, end_date=None):
+    """Builds the sale_date range conditions shared by the sales queries (sales aliased as s)."""
+    conditions = []
+    params = []
+    if start_date:
+        conditions.append("s.sale_date >= %s")
+        params.append(start_date)
+    if end_date:
+        # end_date is inclusive of the whole day
+        conditions.append("s.sale_date <= %s")
+        params.append(f"{end_date} 23:59:59")
+    return conditions, params
+
+def _sale_date_bounds(start_date=None, end_date=None):
+    """
+    Parameters for the fixed `BETWEEN COALESCE(start, '-infinity') AND COALESCE(end, 'infinity')`
+    range used by the report statements, which keeps their SQL text the same for every range.
+    """
+    return (start_date or None, f"{end_date} 23:59:59" if end_date else None)
+
+def get_all_sales(start_date=None, end_date=None, product_name=None):
+    """Fetches sales, optionally limited to a date range and to sales containing a given product."""
+    conn = connect_db()
+    if not conn: return []
+    try:
+        cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+
+        conditions, params = _sale_date_conditions(start_date, end_date)
+        if product_name:
+            # EXISTS stops at the first matching line item and yields each sale once,
+            # where a JOIN would repeat the sale for every matching item.
+            conditions.append("""EXISTS (
+                SELECT 1 FROM sale_items si
+                JOIN products p ON si.product_id = p.id
+                WHERE si.sale_id = s.id AND p.name ILIKE %s
+            )""")
+            params.append(f"%{product_name}%")
+
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor.execute(f"""
+            SELECT s.id, s.sale_date, s.total_amount, s.discount_amount, s.tax_amount,
+                   s.customer_id, s.status, s.due_date,
+                   COALESCE(c.name, 'N/A') as customer_name
+            FROM sales s
+            LEFT JOIN customers c ON s.customer_id = c.id
+            {where_clause}
+            ORDER BY s.sale_date DESC
+        """, tuple(params))
+        return _fetchall_as_dicts(cursor)
+    except psycopg2.Error as e:
+        print(f"Error fetching sales: {e}")
+        return []
+    finally:
+        release_db(conn)
+
+def get_sale_by_id(sale_id):
+    """Fetches a single sale header with its customer name."""
+    conn = connect_db()
+    if not conn: return None
+    try:
+        cursor = conn.cursor()
+        _execute_prepared(cursor, 'get_sale', SQL_GET_SALE, (sale_id,))
+        return cursor.fetchone()
+    except psycopg2.Error as e:
+        print(f"Error fetching sale by ID: {e}")
+        return None
+    finally:
+        release_db(conn)
+
+def get_sales_by_ids(sale_ids):
+    """Fetches several sale headers in one query. Returns {sale_id: sale}."""
+    if not sale_ids: return {}
+    conn = connect_db()
+    if not conn: return {}
+    try:
+        cursor = conn.cursor()
+        cursor.execute(SQL_GET_SALES_BY_IDS, (list(sale_ids),))
+        return {row['id']: row for row in cursor.fetchall()}
+    except psycopg2.Error as e:
+        print(f"Error fetching sales by IDs: {e}")
+        return {}
+    finally:
+        release_db(conn)
+
+def get_sale_details(sale_id):
+    """Fetches the line items of a sale."""
+    conn = connect_db()
+    if not conn: return []
+    try:
+        cursor = conn.cursor()
+        _execute_prepared(cursor, 'get_sale_items', SQL_GET_SALE_ITEMS, (sale_id,))
+        return cursor.fetchall()
+    except psycopg2.Error as e:
+        print(f"Error fetching sale details: {e}")
+        return []
+    finally:
+        release_db(conn)
 
 def get_sale_payments(sale_id):
     """Fetches all payments associated with a specific sale ID."""
     conn = connect_db()
     if not conn: return []
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor()
         cursor.execute("SELECT payment_method, amount FROM sale_payments WHERE sale_id = %s", (sale_id,))
         return cursor.fetchall()
     except psycopg2.Error as e:
         print(f"Error fetching payments for sale ID {sale_id}: {e}")
         return []
     finally:
-        if conn: conn.close()
+        if conn: release_db(conn)
         
 def get_customer_by_id(customer_id):
     conn = connect_db()
     if conn:
         try:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor = conn.cursor()
             cursor.execute("SELECT * FROM customers WHERE id = %s", (customer_id,))
             return cursor.fetchone()
         except psycopg2.Error as e:
             print(f"Error fetching customer by ID: {e}")
             return None
         finally:
-            conn.close()
+            release_db(conn)
 
 def update_customer(customer_id, name, phone=None, email=None):
     conn = connect_db()
@@ -511,7 +1077,7 @@ def update_customer(customer_id, name, phone=None, email=None):
             print(f"Error updating customer: {e}")
             return False
         finally:
-            conn.close()
+            release_db(conn)
 
 def delete_customer(customer_id):
     conn = connect_db()
@@ -530,7 +1096,7 @@ def delete_customer(customer_id):
             print(f"Error deleting customer: {e}")
             return False
         finally:
-            conn.close()        
+            release_db(conn)        
 
 def record_purchase(supplier_id, purchase_items_list):
     """Records a purchase and creates corresponding double-entry journal records."""
@@ -562,13 +1128,62 @@ def record_purchase(supplier_id, purchase_items_list):
         _create_journal_entry(cursor, f"Purchase from supplier - ID: {purchase_id}", "Inventory", "Accounts Payable", total_cost, purchase_id, 'purchase')
 
         conn.commit()
+        _invalidate_report_cache()
         return True, purchase_id
     except Exception as e:
         print(f"Error recording purchase with journal entry: {e}")
         if conn: conn.rollback()
         return False, None
     finally:
-        if conn: conn.close()
+        if conn: release_db(conn)
+
+def record_purchase_bulk(supplier_id, purchase_items_list):
+    """
+    Records a large purchase (e.g. a full supplier delivery) using batched
+    statements, so hundreds of lines cost a handful of round trips.
+    Produces the same records and journal entry as record_purchase().
+    """
+    try:
+        with transaction() as conn:
+            cursor = conn.cursor()
+            total_cost = sum(item['quantity'] * item['cost'] for item in purchase_items_list)
+            purchase_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S') # Get current local time
+
+            cursor.execute("INSERT INTO purchases (supplier_id, total_cost, purchase_date) VALUES (%s, %s, %s) RETURNING id",
+                          (supplier_id, total_cost, purchase_timestamp))
+            purchase_id = cursor.fetchone()['id']
+
+            execute_values(cursor,
+                "INSERT INTO purchase_items (purchase_id, product_id, quantity, cost_at_purchase) VALUES %s",
+                [(purchase_id, item['product_id'], item['quantity'], item['cost']) for item in purchase_items_list],
+                page_size=1000)
+
+            # Collapse repeated lines for the same product so each row is updated once;
+            # the last line wins for the new prices, as it would in record_purchase().
+            product_updates = {}
+            for item in purchase_items_list:
+                quantity = product_updates.get(item['product_id'], (0,))[0] + item['quantity']
+                product_updates[item['product_id']] = (quantity, item['new_price'], item['cost'])
+
+            execute_values(cursor, """
+                    UPDATE products AS p
+                    SET stock = p.stock + v.quantity,
+                        price = v.new_price,
+                        buying_price = v.cost
+                    FROM (VALUES %s) AS v(product_id, quantity, new_price, cost)
+                    WHERE p.id = v.product_id
+                """,
+                [(product_id,) + values for product_id, values in product_updates.items()],
+                template="(%s::INTEGER, %s::INTEGER, %s::REAL, %s::REAL)",
+                page_size=1000)
+
+            _create_journal_entry(cursor, f"Purchase from supplier - ID: {purchase_id}", "Inventory", "Accounts Payable", total_cost, purchase_id, 'purchase')
+
+        _invalidate_report_cache()
+        return True, purchase_id
+    except Exception as e:
+        print(f"Error recording bulk purchase with journal entry: {e}")
+        return False, None
 
 def delete_sale_by_id(sale_id):
     """
@@ -597,13 +1212,14 @@ def delete_sale_by_id(sale_id):
         cursor.execute("DELETE FROM sales WHERE id = %s", (sale_id,))
         
         conn.commit()
+        _invalidate_report_cache()
         return cursor.rowcount > 0
     except psycopg2.Error as e:
         print(f"Error deleting sale ID {sale_id}: {e}")
         if conn: conn.rollback()
         return False
     finally:
-        if conn: conn.close()        
+        if conn: release_db(conn)        
 
 def add_expense(description, amount, expense_account_name, payment_account_name):
     """Adds an expense and creates the corresponding journal entry."""
@@ -640,154 +1256,283 @@ def add_expense(description, amount, expense_account_name, payment_account_name)
         if conn: conn.rollback()
         return False
     finally:
-        if conn: conn.close()
+        if conn: release_db(conn)
 
 def get_chart_of_accounts():
     """Fetches all accounts from the Chart of Accounts."""
     conn = connect_db()
     if not conn: return []
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor()
         cursor.execute("SELECT id, name, type, parent_id FROM chart_of_accounts ORDER BY type, name")
         return cursor.fetchall()
     except Exception as e:
         print(f"Error fetching chart of accounts: {e}")
         return []
     finally:
-        conn.close()
+        release_db(conn)
+
+# The chart of accounts only changes when it is populated, so lookups by type are
+# memoized per process and cleared by populate_chart_of_accounts().
+ACCOUNT_TYPES = ('Asset', 'Liability', 'Equity', 'Revenue', 'Expense')
+_accounts_by_type_cache = {}
 
 def get_accounts_by_type(account_type):
     """Fetches all accounts of a specific type."""
+    cached = _accounts_by_type_cache.get(account_type)
+    if cached is not None:
+        return list(cached)
+
     conn = connect_db()
     if not conn: return []
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor()
         cursor.execute("SELECT id, name FROM chart_of_accounts WHERE type = %s ORDER BY name", (account_type,))
-        return cursor.fetchall()
+        accounts = cursor.fetchall()
+        if account_type in ACCOUNT_TYPES:
+            _accounts_by_type_cache[account_type] = accounts
+        return list(accounts)
     except Exception as e:
         print(f"Error fetching accounts by type: {e}")
         return []
     finally:
-        conn.close()
-
-def get_journal_entries():
-    """Fetches all journal entries for display in the General Ledger."""
-    conn = connect_db()
+        release_db(conn)
+
+SQL_JOURNAL_LINES = """
+    WITH page AS (
+        SELECT id, date, description, debit_account_id, credit_account_id, amount
+        FROM journal_entries
+        ORDER BY date DESC, id DESC
+        LIMIT %(entry_limit)s OFFSET %(entry_offset)s
+    )
+    SELECT p.date, a.name as account_name, p.description,
+           CASE WHEN l.line = 0 THEN p.amount END as debit,
+           CASE WHEN l.line = 1 THEN p.amount END as credit
+    FROM page p
+    CROSS JOIN (VALUES (0), (1)) l(line)
+    JOIN chart_of_accounts a
+        ON a.id = CASE WHEN l.line = 0 THEN p.debit_account_id ELSE p.credit_account_id END
+    ORDER BY p.date DESC, p.id DESC, l.line
+    LIMIT %(limit)s OFFSET %(line_offset)s
+"""
+
+def get_journal_entries(limit=None, offset=0):
+    """
+    Fetches journal entries for display in the General Ledger, one line per
+    debit and credit side. Pass limit/offset to fetch a single page.
+    """
+    conn = connect_db_readonly()
     if not conn: return []
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("""
-            SELECT
-                je.date,
-                je.description,
-                je.amount,
-                (SELECT name FROM chart_of_accounts WHERE id = je.debit_account_id) as debit_account,
-                (SELECT name FROM chart_of_accounts WHERE id = je.credit_account_id) as credit_account
-            FROM journal_entries je
-            ORDER BY je.date DESC, je.id DESC
-        """)
-
-        # Unwind the single entry into two rows for traditional ledger view
-        ledger_lines = []
-        for row in cursor.fetchall():
-            ledger_lines.append({
-                'date': row['date'],
-                'account_name': row['debit_account'],
-                'description': row['description'],
-                'debit': row['amount'],
-                'credit': None
-            })
-            ledger_lines.append({
-                'date': row['date'],
-                'account_name': row['credit_account'],
-                'description': row['description'],
-                'debit': None,
-                'credit': row['amount']
-            })
-        return ledger_lines
+        cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+        # Every entry unwinds into exactly two lines (debit, then credit), so the page
+        # is cut from journal_entries first, walking idx_journal_date, and only those
+        # entries are unwound for the traditional ledger view.
+        line_offset = offset % 2
+        cursor.execute(SQL_JOURNAL_LINES, {
+            'entry_limit': (line_offset + limit + 1) // 2 if limit is not None else None,
+            'entry_offset': offset // 2,
+            'limit': limit,
+            'line_offset': line_offset
+        })
+        return _fetchall_as_dicts(cursor)
     except Exception as e:
         print(f"Error fetching journal entries: {e}")
         return []
     finally:
-        conn.close()
+        release_db(conn)
+
+def iter_journal_entries(batch_size=1000):
+    """
+    Yields every General Ledger line, newest first, without loading the whole
+    journal into memory: rows are pulled from a server-side cursor batch_size at
+    a time. The pooled connection is held until the generator is exhausted or closed.
+    """
+    conn = connect_db_readonly()
+    if not conn: return
+    try:
+        cursor = conn.cursor(name='journal_export', cursor_factory=psycopg2.extensions.cursor)
+        cursor.itersize = batch_size
+        cursor.execute(SQL_JOURNAL_LINES, {'entry_limit': None, 'entry_offset': 0, 'limit': None, 'line_offset': 0})
+        columns = None
+        for row in cursor:
+            if columns is None:
+                columns = [column.name for column in cursor.description]
+            yield dict(zip(columns, row))
+    except psycopg2.Error as e:
+        print(f"Error streaming journal entries: {e}")
+    finally:
+        release_db(conn)
 
 def get_account_balance(account_names, start_date=None, end_date=None):
     """Calculates the balance for a given list of account names."""
-    conn = connect_db()
+    conn = connect_db_readonly()
     if not conn: return 0.0
     try:
         cursor = conn.cursor()
 
-        placeholders = ','.join(['%s'] * len(account_names))
-        cursor.execute(f"SELECT id, name, type FROM chart_of_accounts WHERE name IN ({placeholders})", account_names)
-        accounts = cursor.fetchall()
-        if not accounts: return 0.0
-
-        account_ids = [acc['id'] for acc in accounts]
-        account_type = accounts[0]['type'] # Assume all passed accounts are of the same base type
-
         # Build date conditions if provided
         date_condition = ""
-        params_debit = list(account_ids)
-        params_credit = list(account_ids)
-
         if start_date:
-            date_condition += " AND date >= %s"
-            params_debit.append(start_date)
-            params_credit.append(start_date)
+            date_condition += " AND je.date >= %(start_date)s"
         if end_date:
             # For Balance Sheet, end_date is inclusive of the whole day
-            date_condition += " AND date <= %s"
-            params_debit.append(f"{end_date} 23:59:59")
-            params_credit.append(f"{end_date} 23:59:59")
-
-        # Calculate debits
-        debit_query = f"""
-            SELECT SUM(amount) FROM journal_entries
-            WHERE debit_account_id IN ({','.join(['%s'] * len(account_ids))}) {date_condition}
-        """
-        cursor.execute(debit_query, params_debit)
-        total_debits = cursor.fetchone()['sum'] or 0.0
+            date_condition += " AND je.date <= %(end_date)s"
+
+        # Account type, debits and credits all come back from one statement.
+        # Lists are bound as a single array parameter, so the statement text is the
+        # same no matter how many accounts are requested.
+        cursor.execute(f"""
+            SELECT MIN(a.type) as type,
+                   COALESCE(SUM(CASE WHEN je.debit_account_id = a.id THEN je.amount END), 0) as total_debits,
+                   COALESCE(SUM(CASE WHEN je.credit_account_id = a.id THEN je.amount END), 0) as total_credits
+            FROM chart_of_accounts a
+            LEFT JOIN journal_entries je
+                ON (je.debit_account_id = a.id OR je.credit_account_id = a.id) {date_condition}
+            WHERE a.name = ANY(%(account_names)s)
+        """, {
+            'account_names': list(account_names),
+            'start_date': start_date,
+            'end_date': f"{end_date} 23:59:59" if end_date else None
+        })
+        row = cursor.fetchone()
+
+        # Assume all passed accounts are of the same base type
+        return _balance_for_type(row['type'], row['total_debits'], row['total_credits'])
 
-        # Calculate credits
-        credit_query = f"""
-            SELECT SUM(amount) FROM journal_entries
-            WHERE credit_account_id IN ({','.join(['%s'] * len(account_ids))}) {date_condition}
-        """
-        cursor.execute(credit_query, params_credit)
-        total_credits = cursor.fetchone()['id'] or 0.0
+    except Exception as e:
+        print(f"Error calculating account balance for {account_names}: {e}")
+        return 0.0
+    finally:
+        if conn: release_db(conn)
 
-        # Balance calculation depends on the account type
-        if account_type in ['Asset', 'Expense']:
-            return total_debits - total_credits
-        elif account_type in ['Liability', 'Equity', 'Revenue']:
-            # For contra-revenue like 'Sales Discounts', this will correctly show a negative value
-            return total_credits - total_debits
+def get_account_balances(account_names, start_date=None, end_date=None):
+    """Calculates the balance of each named account in one query. Returns {account_name: balance}."""
+    conn = connect_db_readonly()
+    if not conn: return {}
+    try:
+        cursor = conn.cursor()
 
-        return 0.0
+        date_condition = ""
+        if start_date:
+            date_condition += " AND je.date >= %(start_date)s"
+        if end_date:
+            date_condition += " AND je.date <= %(end_date)s"
+
+        cursor.execute(f"""
+            SELECT a.name, a.type,
+                   COALESCE(SUM(CASE WHEN je.debit_account_id = a.id THEN je.amount END), 0) as total_debits,
+                   COALESCE(SUM(CASE WHEN je.credit_account_id = a.id THEN je.amount END), 0) as total_credits
+            FROM chart_of_accounts a
+            LEFT JOIN journal_entries je
+                ON (je.debit_account_id = a.id OR je.credit_account_id = a.id) {date_condition}
+            WHERE a.name = ANY(%(account_names)s)
+            GROUP BY a.id, a.name, a.type
+        """, {
+            'account_names': list(account_names),
+            'start_date': start_date,
+            'end_date': f"{end_date} 23:59:59" if end_date else None
+        })
 
+        return {
+            row['name']: _balance_for_type(row['type'], row['total_debits'], row['total_credits'])
+            for row in cursor.fetchall()
+        }
     except Exception as e:
-        print(f"Error calculating account balance for {account_names}: {e}")
-        return 0.0
+        print(f"Error calculating account balances for {account_names}: {e}")
+        return {}
+    finally:
+        release_db(conn)
+
+def _balance_for_type(account_type, total_debits, total_credits):
+    """Applies the normal-balance sign rule for an account type."""
+    # Balance calculation depends on the account type
+    if account_type in ['Asset', 'Expense']:
+        return total_debits - total_credits
+    elif account_type in ['Liability', 'Equity', 'Revenue']:
+        # For contra-revenue like 'Sales Discounts', this will correctly show a negative value
+        return total_credits - total_debits
+
+    return 0.0
+
+def _get_all_account_balances(start_date=None, end_date=None):
+    """
+    Calculates the balance of every account in a single aggregate query.
+    Returns an ordered dict of {account_name: (account_type, balance)}, sorted by name.
+    Revenue and Expense accounts with no net movement are left out; the balance
+    sheet accounts are always listed.
+    """
+    conn = connect_db_readonly()
+    if not conn: return {}
+    try:
+        cursor = conn.cursor()
+
+        # Build date conditions if provided
+        date_condition = ""
+        if start_date:
+            date_condition += " AND date >= %(start_date)s"
+        if end_date:
+            # For Balance Sheet, end_date is inclusive of the whole day
+            date_condition += " AND date <= %(end_date)s"
+
+        # Each entry contributes its amount to the debit side of one account and
+        # the credit side of another; both sides are summed per account in one pass.
+        cursor.execute(f"""
+            SELECT a.name, a.type,
+                   COALESCE(SUM(l.debit), 0) as total_debits,
+                   COALESCE(SUM(l.credit), 0) as total_credits
+            FROM chart_of_accounts a
+            LEFT JOIN (
+                SELECT debit_account_id as account_id, amount as debit, 0 as credit
+                FROM journal_entries WHERE TRUE {date_condition}
+                UNION ALL
+                SELECT credit_account_id, 0, amount
+                FROM journal_entries WHERE TRUE {date_condition}
+            ) l ON l.account_id = a.id
+            GROUP BY a.id, a.name, a.type
+            HAVING a.type IN ('Asset', 'Liability', 'Equity')
+                OR COALESCE(SUM(l.debit), 0) <> COALESCE(SUM(l.credit), 0)
+            ORDER BY a.name
+        """, {'start_date': start_date, 'end_date': f"{end_date} 23:59:59" if end_date else None})
+
+        return {
+            row['name']: (row['type'], _balance_for_type(row['type'], row['total_debits'], row['total_credits']))
+            for row in cursor.fetchall()
+        }
+    except Exception as e:
+        print(f"Error calculating account balances: {e}")
+        return {}
     finally:
-        if conn: conn.close()
+        release_db(conn)
+
+def _balance_of(balances, account_name):
+    """Looks up an account's balance in the result of _get_all_account_balances()."""
+    return balances.get(account_name, (None, 0.0))[1]
 
 def get_profit_and_loss_statement(start_date=None, end_date=None):
     """Generates data for a Profit and Loss statement."""
-    total_revenue = get_account_balance(['Sales Revenue'], start_date, end_date)
-    # get_account_balance for a debit-balance account like 'Sales Discounts' will return a positive value.
-    sales_discounts = get_account_balance(['Sales Discounts'], start_date, end_date)
+    return _build_profit_and_loss(_get_all_account_balances(start_date, end_date))
+
+def _build_profit_and_loss(balances):
+    """Builds the Profit and Loss figures from the result of _get_all_account_balances()."""
+    total_revenue = _balance_of(balances, 'Sales Revenue')
+    # 'Sales Discounts' is a contra-revenue account: its debit balance comes back
+    # negative under the Revenue sign rule, so flip it to the positive discount total.
+    # Without activity the account is filtered out, and negating the 0.0 default
+    # would report -0.0.
+    sales_discounts = 0.0
+    if 'Sales Discounts' in balances:
+        sales_discounts = -_balance_of(balances, 'Sales Discounts')
     net_revenue = total_revenue - sales_discounts
 
-    total_cogs = get_account_balance(['Cost of Goods Sold'], start_date, end_date)
+    total_cogs = _balance_of(balances, 'Cost of Goods Sold')
     gross_profit = net_revenue - total_cogs
 
-    expense_accounts = [acc['name'] for acc in get_accounts_by_type('Expense') if acc['name'] != 'Cost of Goods Sold']
-
     expense_details = []
     total_expenses = 0
-    for acc_name in expense_accounts:
-        balance = get_account_balance([acc_name], start_date, end_date)
+    for acc_name, (acc_type, balance) in balances.items():
+        if acc_type != 'Expense' or acc_name == 'Cost of Goods Sold':
+            continue
         if balance > 0:
             expense_details.append({'category': acc_name, 'amount': balance})
             total_expenses += balance
@@ -805,36 +1550,34 @@ def get_profit_and_loss_statement(start_date=None, end_date=None):
 
 def get_balance_sheet(end_date=None):
     """Generates data for a Balance Sheet as of a specific end date."""
+    balances = _get_all_account_balances(end_date=end_date)
+
     # Assets
-    asset_accounts = [acc['name'] for acc in get_accounts_by_type('Asset')]
     asset_details = []
     total_assets = 0
-    for acc_name in asset_accounts:
-        balance = get_account_balance([acc_name], end_date=end_date)
-        asset_details.append({'name': acc_name, 'balance': balance})
-        total_assets += balance
+    for acc_name, (acc_type, balance) in balances.items():
+        if acc_type == 'Asset':
+            asset_details.append({'name': acc_name, 'balance': balance})
+            total_assets += balance
 
     # Liabilities
-    liability_accounts = [acc['name'] for acc in get_accounts_by_type('Liability')]
     liability_details = []
     total_liabilities = 0
-    for acc_name in liability_accounts:
-        balance = get_account_balance([acc_name], end_date=end_date)
-        liability_details.append({'name': acc_name, 'balance': balance})
-        total_liabilities += balance
+    for acc_name, (acc_type, balance) in balances.items():
+        if acc_type == 'Liability':
+            liability_details.append({'name': acc_name, 'balance': balance})
+            total_liabilities += balance
 
     # Equity
     # Calculate the net profit for the period, which represents the Retained Earnings.
-    pnl_data = get_profit_and_loss_statement(end_date=end_date)
-    current_period_profit = pnl_data['net_profit']
+    # The income and expense balances are already in hand, so no second pass is needed.
+    current_period_profit = _build_profit_and_loss(balances)['net_profit']
 
-    equity_accounts = [acc['name'] for acc in get_accounts_by_type('Equity')]
     equity_details = []
     total_equity = 0
-    for acc_name in equity_accounts:
-        # Get the base balance (e.g., for Owner's initial contribution)
-        balance = get_account_balance([acc_name], end_date=end_date)
-        
+    for acc_name, (acc_type, balance) in balances.items():
+        if acc_type != 'Equity':
+            continue
         # Specifically assign the calculated profit to the 'Retained Earnings' line
         if acc_name == 'Retained Earnings':
             balance = current_period_profit
@@ -855,8 +1598,7 @@ def add_customer(name, phone=None, email=None):
     if conn:
         try:
             cursor = conn.cursor()
-            cursor.execute("INSERT INTO customers (name, phone, email) VALUES (%s, %s, %s) RETURNING id",
-                           (name, phone, email))
+            cursor.execute(SQL_ADD_CUSTOMER, (name, phone, email))
             customer_id = cursor.fetchone()['id']
             conn.commit()
             return customer_id
@@ -867,46 +1609,51 @@ def add_customer(name, phone=None, email=None):
             print(f"Error adding customer: {e}")
             return None
         finally:
-            conn.close()
+            release_db(conn)
 
 def get_all_customers():
     conn = connect_db()
     if conn:
         try:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("SELECT * FROM customers ORDER BY name")
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, name, phone, email, credit_limit FROM customers ORDER BY name")
             return cursor.fetchall()
         except psycopg2.Error as e:
             print(f"Error fetching customers: {e}")
             return []
         finally:
-            conn.close()
+            release_db(conn)
 
 def get_customer_ledger_summary():
     """
     Calculates the ledger summary for all customers with outstanding balances.
     Returns a list of dictionaries with customer info and their debt summary.
     """
-    conn = connect_db()
+    conn = connect_db_readonly()
     if not conn: return []
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor()
         query = """
             SELECT
                 c.id as customer_id,
                 c.name as customer_name,
                 c.phone as customer_phone,
                 SUM(s.total_amount) as total_debt,
-                (SELECT SUM(p.amount)
-                 FROM sale_payments p
-                 JOIN sales s_inner ON p.sale_id = s_inner.id
-                 WHERE s_inner.customer_id = c.id) as total_paid,
+                COALESCE(paid.total_paid, 0) as total_paid,
                 MIN(s.due_date) as earliest_due_date
             FROM customers c
             JOIN sales s ON c.id = s.customer_id
+            -- Payments are aggregated per customer once, instead of once per customer group
+            LEFT JOIN (
+                SELECT s_inner.customer_id, SUM(p.amount) as total_paid
+                FROM sale_payments p
+                JOIN sales s_inner ON p.sale_id = s_inner.id
+                WHERE s_inner.status IN ('Due', 'Partial')
+                GROUP BY s_inner.customer_id
+            ) paid ON paid.customer_id = c.id
             WHERE s.status IN ('Due', 'Partial')
-            GROUP BY c.id, c.name, c.phone
-            HAVING (total_debt - total_paid) > 0.01
+            GROUP BY c.id, c.name, c.phone, paid.total_paid
+            HAVING SUM(s.total_amount) - COALESCE(paid.total_paid, 0) > 0.01
             ORDER BY c.name;
         """
         cursor.execute(query)
@@ -915,47 +1662,89 @@ def get_customer_ledger_summary():
         print(f"Error fetching customer ledger summary: {e}")
         return []
     finally:
-        if conn: conn.close()
+        if conn: release_db(conn)
 
 # --- Product Management Functions ---
+def add_products_bulk(products_list):
+    """
+    Inserts many products in a single transaction with batched statements.
+    Returns the new product IDs in input order, or None if any product fails
+    (in which case none are added).
+    """
+    try:
+        with transaction() as conn:
+            cursor = conn.cursor()
+            rows = execute_values(cursor, """
+                    INSERT INTO products (name, price, stock, category_id, sku, description, image_data, barcode, buying_price, low_stock_threshold)
+                    VALUES %s RETURNING id
+                """,
+                [(product['name'], product['price'], product['stock'], product.get('category_id'),
+                  product.get('sku'), product.get('description'), product.get('image_data'), product.get('barcode'),
+                  product.get('buying_price', 0.0), product.get('low_stock_threshold', 10))
+                 for product in products_list],
+                page_size=1000, fetch=True)
+        _invalidate_report_cache()
+        return [row['id'] for row in rows]
+    except psycopg2.IntegrityError as e:
+        print(f"Product name or barcode already exists: {e}")
+        return None
+    except psycopg2.Error as e:
+        print(f"Error adding products: {e}")
+        return None
+
 def add_product(name, price, stock, category_id=None, sku=None, description=None, image_data=None, barcode=None, buying_price=0.0, low_stock_threshold=10):
+    product_ids = add_products_bulk([{
+        'name': name, 'price': price, 'stock': stock, 'category_id': category_id, 'sku': sku,
+        'description': description, 'image_data': image_data, 'barcode': barcode,
+        'buying_price': buying_price, 'low_stock_threshold': low_stock_threshold
+    }])
+    return product_ids[0] if product_ids else None
+
+def get_product_by_id(product_id):
     conn = connect_db()
     if conn:
         try:
             cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO products (name, price, stock, category_id, sku, description, image_data, barcode, buying_price, low_stock_threshold)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
-            """, (name, price, stock, category_id, sku, description, image_data, barcode, buying_price, low_stock_threshold))
-            product_id = cursor.fetchone()['id']
-            conn.commit()
-            return product_id
-        except psycopg2.IntegrityError:
-            print(f"Product with name '{name}' or barcode '{barcode}' already exists.")
-            return None
+            _execute_prepared(cursor, 'get_product', SQL_GET_PRODUCT, (product_id,))
+            return cursor.fetchone()
         except psycopg2.Error as e:
-            print(f"Error adding product: {e}")
+            print(f"Error fetching product by ID: {e}")
             return None
         finally:
-            conn.close()
+            release_db(conn)
+
+def get_products_by_ids(product_ids):
+    """Fetches several products in one query. Returns {product_id: product}."""
+    if not product_ids: return {}
+    conn = connect_db()
+    if not conn: return {}
+    try:
+        cursor = conn.cursor()
+        cursor.execute(SQL_GET_PRODUCTS_BY_IDS, (list(product_ids),))
+        return {row['id']: row for row in cursor.fetchall()}
+    except psycopg2.Error as e:
+        print(f"Error fetching products by IDs: {e}")
+        return {}
+    finally:
+        release_db(conn)
 
 def get_all_products():
     conn = connect_db()
     if conn:
         try:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("""
-                SELECT p.*, c.name as category_name
+            cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+            cursor.execute(f"""
+                SELECT {PRODUCT_LIST_COLUMNS}
                 FROM products p
                 LEFT JOIN categories c ON p.category_id = c.id
                 ORDER BY p.name
             """)
-            return cursor.fetchall()
+            return _fetchall_as_dicts(cursor)
         except psycopg2.Error as e:
             print(f"Error fetching products: {e}")
             return []
         finally:
-            conn.close()
+            release_db(conn)
 
 def update_product(product_id, name, price, stock, category_id=None, sku=None, description=None, image_data=None, barcode=None, buying_price=0.0, low_stock_threshold=10):
     conn = connect_db()
@@ -973,6 +1762,7 @@ def update_product(product_id, name, price, stock, category_id=None, sku=None, d
                     WHERE id=%s
                 """, (name, price, stock, category_id, sku, description, barcode, buying_price, low_stock_threshold, product_id))
             conn.commit()
+            _invalidate_report_cache()
             return cursor.rowcount > 0
         except psycopg2.IntegrityError:
             print(f"Product with name '{name}' or barcode '{barcode}' already exists.")
@@ -981,34 +1771,37 @@ def update_product(product_id, name, price, stock, category_id=None, sku=None, d
             print(f"Error updating product: {e}")
             return False
         finally:
-            conn.close()
+            release_db(conn)
 
 def delete_product(product_id):
     conn = connect_db()
     if conn:
         try:
             cursor = conn.cursor()
-            # Check if product is linked to sales
-            cursor.execute("SELECT 1 FROM sale_items WHERE product_id = %s LIMIT 1", (product_id,))
-            if cursor.fetchone():
-                return False # Cannot delete if linked
-            
-            cursor.execute("DELETE FROM products WHERE id = %s", (product_id,))
+            # Only delete if the product is not linked to any sale or purchase;
+            # the check and the delete run as one statement.
+            cursor.execute("""
+                DELETE FROM products
+                WHERE id = %s
+                  AND NOT EXISTS (SELECT 1 FROM sale_items WHERE product_id = %s)
+                  AND NOT EXISTS (SELECT 1 FROM purchase_items WHERE product_id = %s)
+            """, (product_id, product_id, product_id))
             conn.commit()
+            _invalidate_report_cache()
             return cursor.rowcount > 0
         except psycopg2.Error as e:
             print(f"Error deleting product: {e}")
             return False
         finally:
-            conn.close()
+            release_db(conn)
 
 def get_low_stock_products():
     conn = connect_db()
     if conn:
         try:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("""
-                SELECT p.*, c.name as category_name
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {PRODUCT_LIST_COLUMNS}
                 FROM products p
                 LEFT JOIN categories c ON p.category_id = c.id
                 WHERE p.stock <= p.low_stock_threshold
@@ -1019,7 +1812,7 @@ def get_low_stock_products():
             print(f"Error fetching low stock products: {e}")
             return []
         finally:
-            conn.close()
+            release_db(conn)
 
 # --- Category Management Functions ---
 def add_category(name):
@@ -1027,7 +1820,7 @@ def add_category(name):
     if conn:
         try:
             cursor = conn.cursor()
-            cursor.execute("INSERT INTO categories (name) VALUES (%s) RETURNING id", (name,))
+            cursor.execute(SQL_ADD_CATEGORY, (name,))
             category_id = cursor.fetchone()['id']
             conn.commit()
             return category_id
@@ -1038,20 +1831,20 @@ def add_category(name):
             print(f"Error adding category: {e}")
             return None
         finally:
-            conn.close()
+            release_db(conn)
 
 def get_all_categories():
     conn = connect_db()
     if conn:
         try:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("SELECT * FROM categories ORDER BY name")
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, name FROM categories ORDER BY name")
             return cursor.fetchall()
         except psycopg2.Error as e:
             print(f"Error fetching categories: {e}")
             return []
         finally:
-            conn.close()
+            release_db(conn)
 
 def update_category(category_id, name):
     conn = connect_db()
@@ -1068,26 +1861,25 @@ def update_category(category_id, name):
             print(f"Error updating category: {e}")
             return False
         finally:
-            conn.close()
+            release_db(conn)
 
 def delete_category(category_id):
     conn = connect_db()
     if conn:
         try:
             cursor = conn.cursor()
-            # Check if category is linked to products
-            cursor.execute("SELECT 1 FROM products WHERE category_id = %s LIMIT 1", (category_id,))
-            if cursor.fetchone():
-                return False # Cannot delete if linked
-            
-            cursor.execute("DELETE FROM categories WHERE id = %s", (category_id,))
+            # Only delete if the category is not linked to any product
+            cursor.execute("""
+                DELETE FROM categories
+                WHERE id = %s AND NOT EXISTS (SELECT 1 FROM products WHERE category_id = %s)
+            """, (category_id, category_id))
             conn.commit()
             return cursor.rowcount > 0
         except psycopg2.Error as e:
             print(f"Error deleting category: {e}")
             return False
         finally:
-            conn.close()
+            release_db(conn)
 
 # --- Supplier Management Functions ---
 def add_supplier(name, contact_person=None, phone=None):
@@ -1107,20 +1899,33 @@ def add_supplier(name, contact_person=None, phone=None):
             print(f"Error adding supplier: {e}")
             return None
         finally:
-            conn.close()
+            release_db(conn)
 
 def get_all_suppliers():
     conn = connect_db()
     if conn:
         try:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("SELECT * FROM suppliers ORDER BY name")
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, name, contact_person, phone FROM suppliers ORDER BY name")
             return cursor.fetchall()
         except psycopg2.Error as e:
             print(f"Error fetching suppliers: {e}")
             return []
         finally:
-            conn.close()
+            release_db(conn)
+
+def get_supplier_by_id(supplier_id):
+    conn = connect_db()
+    if conn:
+        try:
+            cursor = conn.cursor()
+            _execute_prepared(cursor, 'get_supplier', SQL_GET_SUPPLIER, (supplier_id,))
+            return cursor.fetchone()
+        except psycopg2.Error as e:
+            print(f"Error fetching supplier by ID: {e}")
+            return None
+        finally:
+            release_db(conn)
 
 def update_supplier(supplier_id, name, contact_person=None, phone=None):
     conn = connect_db()
@@ -1138,26 +1943,25 @@ def update_supplier(supplier_id, name, contact_person=None, phone=None):
             print(f"Error updating supplier: {e}")
             return False
         finally:
-            conn.close()
+            release_db(conn)
 
 def delete_supplier(supplier_id):
     conn = connect_db()
     if conn:
         try:
             cursor = conn.cursor()
-            # Check if supplier is linked to purchases
-            cursor.execute("SELECT 1 FROM purchases WHERE supplier_id = %s LIMIT 1", (supplier_id,))
-            if cursor.fetchone():
-                return False # Cannot delete if linked
-            
-            cursor.execute("DELETE FROM suppliers WHERE id = %s", (supplier_id,))
+            # Only delete if the supplier is not linked to any purchase
+            cursor.execute("""
+                DELETE FROM suppliers
+                WHERE id = %s AND NOT EXISTS (SELECT 1 FROM purchases WHERE supplier_id = %s)
+            """, (supplier_id, supplier_id))
             conn.commit()
             return cursor.rowcount > 0
         except psycopg2.Error as e:
             print(f"Error deleting supplier: {e}")
             return False
         finally:
-            conn.close()
+            release_db(conn)
 
 # --- User Management Functions ---
 def add_user(username, password, role='cashier'):
@@ -1165,7 +1969,7 @@ def add_user(username, password, role='cashier'):
     if conn:
         try:
             cursor = conn.cursor()
-            password_hash = generate_password_hash(password)
+            password_hash = generate_password_hash(password, method=PASSWORD_HASH_METHOD)
             cursor.execute("INSERT INTO users (username, password_hash, role) VALUES (%s, %s, %s) RETURNING id",
                            (username, password_hash, role))
             user_id = cursor.fetchone()['id']
@@ -1178,20 +1982,35 @@ def add_user(username, password, role='cashier'):
             print(f"Error adding user: {e}")
             return None
         finally:
-            conn.close()
+            release_db(conn)
 
 def get_user_by_username(username):
     conn = connect_db()
     if conn:
         try:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
+            cursor = conn.cursor()
+            _execute_prepared(cursor, 'get_user', SQL_GET_USER, (username,))
             return cursor.fetchone()
         except psycopg2.Error as e:
             print(f"Error fetching user: {e}")
             return None
         finally:
-            conn.close()
+            release_db(conn)
+
+def get_users_by_usernames(usernames):
+    """Fetches several users in one query. Returns {username: user}."""
+    if not usernames: return {}
+    conn = connect_db()
+    if not conn: return {}
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, username, password_hash, role FROM users WHERE username = ANY(%s)", (list(usernames),))
+        return {row['username']: row for row in cursor.fetchall()}
+    except psycopg2.Error as e:
+        print(f"Error fetching users: {e}")
+        return {}
+    finally:
+        release_db(conn)
 
 def verify_user(username, password):
     user = get_user_by_username(username)
@@ -1203,21 +2022,21 @@ def get_all_users():
     conn = connect_db()
     if conn:
         try:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor = conn.cursor()
             cursor.execute("SELECT id, username, role FROM users ORDER BY username")
             return cursor.fetchall()
         except psycopg2.Error as e:
             print(f"Error fetching users: {e}")
             return []
         finally:
-            conn.close()
+            release_db(conn)
 
 def update_user_password(user_id, new_password):
     conn = connect_db()
     if conn:
         try:
             cursor = conn.cursor()
-            password_hash = generate_password_hash(new_password)
+            password_hash = generate_password_hash(new_password, method=PASSWORD_HASH_METHOD)
             cursor.execute("UPDATE users SET password_hash = %s WHERE id = %s", (password_hash, user_id))
             conn.commit()
             return cursor.rowcount > 0
@@ -1225,7 +2044,7 @@ def update_user_password(user_id, new_password):
             print(f"Error updating user password: {e}")
             return False
         finally:
-            conn.close()
+            release_db(conn)
 
 def update_user_role(user_id, new_role):
     conn = connect_db()
@@ -1239,7 +2058,7 @@ def update_user_role(user_id, new_role):
             print(f"Error updating user role: {e}")
             return False
         finally:
-            conn.close()
+            release_db(conn)
 
 def delete_user(user_id):
     conn = connect_db()
@@ -1253,28 +2072,59 @@ def delete_user(user_id):
             print(f"Error deleting user: {e}")
             return False
         finally:
-            conn.close()
+            release_db(conn)
 
 # --- Dashboard Data Functions ---
+def get_dashboard_totals():
+    """
+    Fetches the dashboard counters (total sales, product, category and low-stock
+    counts) with one statement; the products counts share a single pass.
+    """
+    totals = {'total_sales': 0.0, 'total_products': 0, 'total_categories': 0, 'low_stock_count': 0}
+    conn = connect_db_readonly()
+    if not conn: return totals
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT (SELECT COALESCE(SUM(total_amount), 0) FROM sales) as total_sales,
+                   COUNT(*) as total_products,
+                   (SELECT COUNT(*) FROM categories) as total_categories,
+                   COUNT(*) FILTER (WHERE p.stock <= p.low_stock_threshold) as low_stock_count
+            FROM products p
+        """)
+        totals.update(cursor.fetchone())
+        return totals
+    except psycopg2.Error as e:
+        print(f"Error fetching dashboard totals: {e}")
+        return totals
+    finally:
+        release_db(conn)
+
 def get_dashboard_data():
     """Fetches data for the dashboard including sales, stock alerts, and financial metrics."""
-    conn = connect_db()
+    conn = connect_db_readonly()
     if not conn: return {}
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor()
         
         # Today's sales
-        today = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute("SELECT COUNT(*) as count, COALESCE(SUM(total_amount), 0) as total FROM sales WHERE DATE(sale_date) = %s", (today,))
+        # A half-open range on the raw column can use idx_sales_date; DATE(sale_date) = today cannot
+        today = datetime.now().date()
+        cursor.execute("""
+            SELECT COUNT(*) as count, COALESCE(SUM(total_amount), 0) as total
+            FROM sales
+            WHERE sale_date >= %s AND sale_date < %s
+        """, (today, today + timedelta(days=1)))
         today_sales = cursor.fetchone()
         
-        # Low stock alerts
-        cursor.execute("SELECT COUNT(*) as count FROM products WHERE stock <= low_stock_threshold")
-        low_stock_count = cursor.fetchone()['count']
-        
-        # Total customers
-        cursor.execute("SELECT COUNT(*) as count FROM customers")
-        customer_count = cursor.fetchone()['count']
+        # Low stock alerts and total customers, in one round trip
+        cursor.execute("""
+            SELECT (SELECT COUNT(*) FROM products WHERE stock <= low_stock_threshold) as low_stock_count,
+                   (SELECT COUNT(*) FROM customers) as customer_count
+        """)
+        counts = cursor.fetchone()
+        low_stock_count = counts['low_stock_count']
+        customer_count = counts['customer_count']
         
         # Recent sales
         cursor.execute("""
@@ -1286,13 +2136,7 @@ def get_dashboard_data():
         recent_sales = cursor.fetchall()
         
         # Top selling products
-        cursor.execute("""
-            SELECT p.name, SUM(si.quantity) as total_sold
-            FROM sale_items si
-            JOIN products p ON si.product_id = p.id
-            GROUP BY p.name
-            ORDER BY total_sold DESC LIMIT 5
-        """)
+        cursor.execute(SQL_TOP_SELLING_PRODUCTS, (5,))
         top_products = cursor.fetchall()
         
         return {
@@ -1307,14 +2151,28 @@ def get_dashboard_data():
         print(f"Error fetching dashboard data: {e}")
         return {}
     finally:
-        conn.close()
+        release_db(conn)
+
+def get_top_selling_products(limit=5):
+    """Returns the best selling products by units sold, read from the sales rollup."""
+    conn = connect_db_readonly()
+    if not conn: return []
+    try:
+        cursor = conn.cursor()
+        cursor.execute(SQL_TOP_SELLING_PRODUCTS, (limit,))
+        return cursor.fetchall()
+    except psycopg2.Error as e:
+        print(f"Error fetching top selling products: {e}")
+        return []
+    finally:
+        release_db(conn)
 
 def get_sales_over_time(days=30):
     """Fetches sales data over time for charts."""
-    conn = connect_db()
+    conn = connect_db_readonly()
     if not conn: return []
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor = conn.cursor()
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
@@ -1331,7 +2189,172 @@ def get_sales_over_time(days=30):
         print(f"Error fetching sales over time: {e}")
         return []
     finally:
-        conn.close()
+        release_db(conn)
+
+def get_weekly_sales_summary():
+    """Fetches the total sales for each of the last 7 days, oldest first, for the dashboard chart."""
+    conn = connect_db_readonly()
+    if not conn: return []
+    try:
+        cursor = conn.cursor()
+        start_day = datetime.now().date() - timedelta(days=6)
+
+        # One grouped query covers the whole week; days without sales are filled in below.
+        cursor.execute("""
+            SELECT DATE(sale_date) as day, COALESCE(SUM(total_amount), 0) as total
+            FROM sales
+            WHERE sale_date >= %s
+            GROUP BY DATE(sale_date)
+        """, (start_day,))
+        daily_totals = {row['day']: row['total'] for row in cursor.fetchall()}
+
+        weekly_summary = []
+        for i in range(7):
+            day = start_day + timedelta(days=i)
+            weekly_summary.append({'day': day.strftime('%a'), 'total_sales': daily_totals.get(day, 0.0)})
+        return weekly_summary
+    except psycopg2.Error as e:
+        print(f"Error fetching weekly sales summary: {e}")
+        return []
+    finally:
+        release_db(conn)
+
+# --- Reporting Functions ---
+
+# Dashboards refresh the same reports with the same parameters over and over, so
+# results are kept per process for REPORT_CACHE_TTL seconds. Writes that change
+# sales, purchases or products clear the cache of the process that made them;
+# other workers catch up when their entries expire. Keys include client-supplied
+# date strings, so at most REPORT_CACHE_SIZE entries are kept, least recently used
+# first out, and callers get copies they are free to modify.
+REPORT_CACHE_TTL = float(os.environ.get('REPORT_CACHE_TTL', 60))
+REPORT_CACHE_SIZE = int(os.environ.get('REPORT_CACHE_SIZE', 64))
+_report_cache = OrderedDict()
+_report_cache_lock = threading.Lock()
+
+def _get_cached_report(key):
+    """Returns a copy of a cached report result, or None if it is missing or expired."""
+    with _report_cache_lock:
+        entry = _report_cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del _report_cache[key]
+            return None
+        _report_cache.move_to_end(key)
+        return copy.deepcopy(entry[1])
+
+def _cache_report(key, value):
+    if REPORT_CACHE_TTL > 0 and REPORT_CACHE_SIZE > 0:
+        now = time.monotonic()
+        with _report_cache_lock:
+            for expired_key in [k for k, (expires_at, _) in _report_cache.items() if expires_at <= now]:
+                del _report_cache[expired_key]
+            _report_cache[key] = (now + REPORT_CACHE_TTL, copy.deepcopy(value))
+            _report_cache.move_to_end(key)
+            while len(_report_cache) > REPORT_CACHE_SIZE:
+                _report_cache.popitem(last=False)
+    return value
+
+def _invalidate_report_cache():
+    with _report_cache_lock:
+        _report_cache.clear()
+
+def get_sales_summary(start_date=None, end_date=None):
+    """
+    Totals, counts, averages and profit for the sales in a date range.
+    The sales scan and the line-item/cost join run as one statement.
+    """
+    summary = {'total_sales': 0.0, 'total_transactions': 0, 'average_sale': 0.0,
+               'total_discounts': 0.0, 'total_tax': 0.0, 'average_tax_rate': 0.0,
+               'gross_sales': 0.0, 'net_sales': 0.0, 'cost_of_goods_sold': 0.0, 'gross_profit': 0.0}
+    cache_key = ('sales_summary', start_date, end_date)
+    cached = _get_cached_report(cache_key)
+    if cached is not None: return cached
+
+    conn = connect_db_readonly()
+    if not conn: return summary
+    try:
+        cursor = conn.cursor()
+        _execute_prepared(cursor, 'sales_summary', SQL_SALES_SUMMARY, _sale_date_bounds(start_date, end_date))
+        row = cursor.fetchone()
+
+        summary.update(row)
+        if row['total_transactions']:
+            summary['average_sale'] = row['total_sales'] / row['total_transactions']
+        summary['net_sales'] = row['gross_sales'] - row['total_discounts']
+        summary['gross_profit'] = summary['net_sales'] - row['cost_of_goods_sold']
+        return _cache_report(cache_key, summary)
+    except psycopg2.Error as e:
+        print(f"Error fetching sales summary: {e}")
+        return summary
+    finally:
+        release_db(conn)
+
+PRODUCT_PERFORMANCE_SORT_COLUMNS = {'quantity': 'total_quantity', 'revenue': 'total_revenue'}
+
+def get_product_performance_report(start_date=None, end_date=None, sort_by='quantity', limit=100):
+    """Top products in a date range by units sold ('quantity') or by revenue ('revenue')."""
+    if sort_by not in PRODUCT_PERFORMANCE_SORT_COLUMNS:
+        sort_by = 'quantity'
+    cache_key = ('product_performance', start_date, end_date, sort_by, limit)
+    cached = _get_cached_report(cache_key)
+    if cached is not None: return cached
+
+    conn = connect_db_readonly()
+    if not conn: return []
+    try:
+        cursor = conn.cursor()
+        sql = SQL_PRODUCT_PERFORMANCE.format(order_column=PRODUCT_PERFORMANCE_SORT_COLUMNS[sort_by])
+        _execute_prepared(cursor, f"product_performance_{sort_by}", sql,
+                          _sale_date_bounds(start_date, end_date) + (limit,))
+        return _cache_report(cache_key, cursor.fetchall())
+    except psycopg2.Error as e:
+        print(f"Error fetching product performance report: {e}")
+        return []
+    finally:
+        release_db(conn)
+
+def get_inventory_summary_report(include_details=True):
+    """
+    Stock totals at cost and retail value, aggregated in SQL.
+    Pass include_details=False when only the totals are needed.
+    """
+    report = {'total_skus': 0, 'total_units': 0, 'total_cost_value': 0.0, 'total_retail_value': 0.0, 'products': []}
+    cache_key = ('inventory_summary', include_details)
+    cached = _get_cached_report(cache_key)
+    if cached is not None: return cached
+
+    conn = connect_db_readonly()
+    if not conn: return report
+    try:
+        cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+        cursor.execute("""
+            SELECT COUNT(*) as total_skus,
+                   COALESCE(SUM(stock), 0) as total_units,
+                   COALESCE(SUM(cost_value), 0) as total_cost_value,
+                   COALESCE(SUM(retail_value), 0) as total_retail_value
+            FROM products
+        """)
+        total_skus, total_units, total_cost_value, total_retail_value = cursor.fetchone()
+        report.update(total_skus=total_skus, total_units=total_units,
+                      total_cost_value=total_cost_value, total_retail_value=total_retail_value)
+
+        if include_details:
+            cursor.execute("""
+                SELECT p.id, p.name, p.sku, c.name as category_name, p.stock, p.low_stock_threshold,
+                       p.buying_price, p.price, p.cost_value, p.retail_value
+                FROM products p
+                LEFT JOIN categories c ON p.category_id = c.id
+                ORDER BY p.name
+            """)
+            report['products'] = _fetchall_as_dicts(cursor)
+        return _cache_report(cache_key, report)
+    except psycopg2.Error as e:
+        print(f"Error fetching inventory summary report: {e}")
+        return report
+    finally:
+        release_db(conn)
 
 # --- Search Functions ---
 def search_products(query):
@@ -1339,10 +2362,10 @@ def search_products(query):
     conn = connect_db()
     if conn:
         try:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor = conn.cursor()
             search_pattern = f"%{query}%"
-            cursor.execute("""
-                SELECT p.*, c.name as category_name
+            cursor.execute(f"""
+                SELECT {PRODUCT_LIST_COLUMNS}
                 FROM products p
                 LEFT JOIN categories c ON p.category_id = c.id
                 WHERE p.name ILIKE %s OR p.sku ILIKE %s OR p.barcode ILIKE %s
@@ -1353,14 +2376,14 @@ def search_products(query):
             print(f"Error searching products: {e}")
             return []
         finally:
-            conn.close()
+            release_db(conn)
 
 def search_customers(query):
     """Searches for customers by name, phone, or email."""
     conn = connect_db()
     if conn:
         try:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor = conn.cursor()
             search_pattern = f"%{query}%"
             cursor.execute("""
                 SELECT *
@@ -1373,14 +2396,14 @@ def search_customers(query):
             print(f"Error searching customers: {e}")
             return []
         finally:
-            conn.close()
+            release_db(conn)
 
 def search_sales(query):
     """Searches for sales by ID, customer name, or date."""
     conn = connect_db()
     if conn:
         try:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor = conn.cursor()
             search_pattern = f"%{query}%"
             cursor.execute("""
                 SELECT s.*, c.name as customer_name
@@ -1394,7 +2417,7 @@ def search_sales(query):
             print(f"Error searching sales: {e}")
             return []
         finally:
-            conn.close()
+            release_db(conn)
 
 # --- Backup and Restore Functions ---
 def backup_database(backup_path):
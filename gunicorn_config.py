@@ -1,13 +1,38 @@
 # gunicorn_config.py
 import multiprocessing
+import os
 
 # Server socket
 bind = "0.0.0.0:10000"  # Render provides the port, but 10000 is a common default
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
+# Requests spend most of their time waiting on PostgreSQL, which threads overlap
+# cheaply, so the app runs a few processes with more threads each rather than
+# the CPU-bound 2*cores+1 heuristic. Every worker keeps its own connection pools
+# (up to DB_POOL_MAX_CONN + DB_READ_POOL_MAX_CONN connections, each of which
+# defaults to at least GUNICORN_THREADS), so keep workers * that total under
+# the database's max_connections.
+workers = int(os.environ.get('WEB_CONCURRENCY', max(2, multiprocessing.cpu_count())))
 worker_class = "gthread"
-threads = 2
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Load the app once in the master, so init_db() (schema, indexes, triggers) runs
+# a single time at boot instead of concurrently in every worker.
+preload_app = True
+
+def when_ready(server):
+    # init_db() left pooled connections open in the master; close them before
+    # workers fork so no socket is shared between processes.
+    import database
+    database.close_db_pool()
+
+def post_fork(server, worker):
+    # Each worker opens its own pools right away rather than on its first request.
+    import database
+    try:
+        database.open_db_pool()
+    except Exception as e:
+        print(f"Error opening database pools in worker {worker.pid}: {e}")
 
 # Logging
 accesslog = "-"